@@ -5,9 +5,13 @@ This script performs BASIC SANITY CHECKS on the /travel-assistant endpoint.
 It validates that the API returns properly formatted travel recommendations.
 """
 
+import orjson
 import requests
 import sys
-from typing import Dict, Any, Tuple
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Tuple, Union
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -20,6 +24,17 @@ load_dotenv()
 BASE_URL = f"http://localhost:{os.getenv('API_PORT', '8000')}"
 ENDPOINT = "/travel-assistant"
 OUTPUT_FILE = "output.txt"
+# (connect, read) timeouts: a dead server fails in seconds, while the LLM
+# still gets up to two minutes to answer
+CONNECT_TIMEOUT = 2.0
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, 120)
+JSON_HEADERS = {"Content-Type": "application/json"}
+# Set TEST_VERBOSE=0 to skip dumping full response bodies into the log file
+VERBOSE = os.getenv("TEST_VERBOSE", "1") != "0"
+
+# Section separators, built once
+SEP = "=" * 70
+SEP_LINE = "\n" + SEP
 
 
 # =============================================================================
@@ -36,31 +51,65 @@ class Colors:
     BOLD = "\033[1m"
 
 
+# Suffix to write after a colored line; uncolored lines need no reset
+_RESET_FOR = {"": ""}
+
+
 class Logger:
     """Dual logger: writes to both console and file"""
 
     def __init__(self, filename: str):
         self.filename = filename
-        with open(self.filename, "w", encoding="utf-8") as f:
-            f.write(f"{'=' * 70}\n")
-            f.write(f"Test Run: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"{'=' * 70}\n\n")
+        # Kept open (and buffered) for the whole run instead of reopened per line
+        self.fh = open(self.filename, "w", encoding="utf-8", buffering=1 << 16)
+        atexit.register(self.close)
+        self.fh.write(SEP + "\n")
+        self.fh.write(f"Test Run: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        self.fh.write(SEP + "\n\n")
 
     def log(self, message: str, color: str = "", file_only: bool = False):
         """Print to console with color and write plain text to file"""
         if not file_only:
-            print(f"{color}{message}{Colors.RESET if color else ''}")
-        with open(self.filename, "a", encoding="utf-8") as f:
-            f.write(message + "\n")
+            reset = _RESET_FOR.get(color, Colors.RESET)
+            sys.stdout.write(color + message + reset + "\n")
+        self.fh.write(message + "\n")
+
+    def close(self):
+        """Flush and close the log file"""
+        self.fh.close()
+
+
+class BufferedLog:
+    """Collects one test's log lines so concurrent tests don't interleave"""
+
+    def __init__(self):
+        self.entries = []
+
+    def log(self, message: str, color: str = "", file_only: bool = False):
+        """Record a line to be written later by replay()"""
+        self.entries.append((message, color, file_only))
+
+    def replay(self, target: Logger):
+        """Write the collected lines to the real logger, in order"""
+        for message, color, file_only in self.entries:
+            target.log(message, color, file_only)
 
 
 # Initialize logger
 logger = Logger(OUTPUT_FILE)
 
+# Shared HTTP session: keep-alive connections reused across (concurrent) tests
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=8))
+
 
 # =============================================================================
 # VALIDATION FUNCTIONS
 # =============================================================================
+# Sentinel for "no offending item found"; None is itself a possible bad item
+_MISSING = object()
+
+
 def validate_response_structure(data: Dict[str, Any]) -> Tuple[bool, str]:
     """
     Validates that the response contains required fields:
@@ -88,21 +137,26 @@ def validate_response_structure(data: Dict[str, Any]) -> Tuple[bool, str]:
             f"Field 'used_tools' should be an array, got {type(data['used_tools']).__name__}",
         )
 
-    for tool in data["used_tools"]:
-        if not isinstance(tool, str):
-            return (
-                False,
-                f"Items in 'used_tools' should be strings, got {type(tool).__name__}",
-            )
+    # One pass: find the first non-string item, if any
+    bad_tool = next(
+        (tool for tool in data["used_tools"] if type(tool) is not str), _MISSING
+    )
+    if bad_tool is not _MISSING:
+        return (
+            False,
+            f"Items in 'used_tools' should be strings, got {type(bad_tool).__name__}",
+        )
 
     return True, "Response structure is valid"
 
 
 def validate_content(data: Dict[str, Any]) -> Tuple[bool, str]:
     """Validates that the response contains meaningful content."""
-    if len(data.get("response", "")) < 10:
+    response_text = data.get("response", "")
+    used_tools = data.get("used_tools", [])
+    if len(response_text) < 10:
         return False, "response is too short"
-    if len(data.get("used_tools", [])) < 1:
+    if not used_tools:
         return False, "used_tools should contain at least one tool"
 
     return True, "Response contains meaningful content"
@@ -111,76 +165,99 @@ def validate_content(data: Dict[str, Any]) -> Tuple[bool, str]:
 # =============================================================================
 # TEST EXECUTION
 # =============================================================================
+# Friendly failure messages for known request errors, checked in order
+_ERROR_MESSAGES = (
+    (
+        requests.exceptions.ConnectionError,
+        f"Connection refused. Is the server running on {BASE_URL}?",
+    ),
+    (requests.exceptions.Timeout, "Request timed out after 120 seconds"),
+)
+
+
 def run_test(
-    test_name: str, payload: Dict[str, Any], expect_success: bool = True
+    test_name: str,
+    payload: Dict[str, Any],
+    expect_success: bool = True,
+    log: Union[Logger, "BufferedLog"] = logger,
+    session: requests.Session = SESSION,
+    body: bytes = None,
 ) -> Dict[str, Any]:
-    """Runs a single test against the API endpoint."""
-    logger.log(f"\n{'=' * 70}", Colors.BLUE)
-    logger.log(f"{test_name}", Colors.BLUE + Colors.BOLD)
-    logger.log(f"{'=' * 70}", Colors.BLUE)
-    logger.log(f"Payload: {payload}")
+    """
+    Runs a single test against the API endpoint.
+
+    ``body`` is the pre-serialized payload; it is encoded here if not given.
+    """
+    log.log(SEP_LINE, Colors.BLUE)
+    log.log(f"{test_name}", Colors.BLUE + Colors.BOLD)
+    log.log(SEP, Colors.BLUE)
+    log.log(f"Payload: {payload}")
 
     result = {"passed": False, "message": ""}
 
     try:
-        response = requests.post(f"{BASE_URL}{ENDPOINT}", json=payload, timeout=120)
-        logger.log(f"Status Code: {response.status_code}")
+        response = session.post(
+            f"{BASE_URL}{ENDPOINT}",
+            data=body if body is not None else orjson.dumps(payload),
+            headers=JSON_HEADERS,
+            timeout=REQUEST_TIMEOUT,
+        )
+        log.log(f"Status Code: {response.status_code}")
 
         if response.status_code == 200 and expect_success:
-            data = response.json()
-            logger.log(f"\n--- Response ---")
-            logger.log(f"response: {data.get('response', '')[:100]}...")
-            logger.log(f"used_tools: {data.get('used_tools', [])}")
+            data = orjson.loads(response.content)
+            log.log(f"\n--- Response ---")
+            log.log(f"response: {data.get('response', '')[:100]}...")
+            log.log(f"used_tools: {data.get('used_tools', [])}")
 
-            # Log full response to file
-            logger.log(f"\n--- Full Response ---", file_only=True)
-            logger.log(str(data), file_only=True)
+            # Log full response to file (skipped entirely unless VERBOSE)
+            if VERBOSE:
+                log.log("\n--- Full Response ---", file_only=True)
+                log.log(str(data), file_only=True)
 
             # Validate structure
             struct_valid, struct_msg = validate_response_structure(data)
             if not struct_valid:
                 result["message"] = struct_msg
-                logger.log(f"\n[FAILED] {struct_msg}", Colors.RED)
+                log.log(f"\n[FAILED] {struct_msg}", Colors.RED)
                 return result
 
             # Validate content
             content_valid, content_msg = validate_content(data)
             if not content_valid:
                 result["message"] = content_msg
-                logger.log(f"\n[FAILED] {content_msg}", Colors.RED)
+                log.log(f"\n[FAILED] {content_msg}", Colors.RED)
                 return result
 
             result["passed"] = True
             result["message"] = "Valid response"
-            logger.log(f"\n[PASSED]", Colors.GREEN)
+            log.log(f"\n[PASSED]", Colors.GREEN)
             return result
 
         elif response.status_code in [400, 422] and not expect_success:
             result["passed"] = True
             result["message"] = "Correctly rejected invalid input"
-            logger.log(f"\n[PASSED] Validation error as expected", Colors.GREEN)
+            log.log(f"\n[PASSED] Validation error as expected", Colors.GREEN)
             return result
 
         else:
             result["message"] = f"Unexpected status code: {response.status_code}"
             try:
-                logger.log(f"Error detail: {response.json()}")
-            except:
-                logger.log(f"Response: {response.text[:200]}")
-            logger.log(f"\n[FAILED] {result['message']}", Colors.RED)
+                log.log(f"Error detail: {orjson.loads(response.content)}")
+            except orjson.JSONDecodeError:
+                # Decode only the preview, not the whole (possibly large) body
+                preview = response.content[:200].decode("utf-8", "replace")
+                log.log(f"Response: {preview}")
+            log.log(f"\n[FAILED] {result['message']}", Colors.RED)
             return result
 
-    except requests.exceptions.ConnectionError:
-        result["message"] = f"Connection refused. Is the server running on {BASE_URL}?"
-        logger.log(f"\n[FAILED] {result['message']}", Colors.RED)
-        return result
-    except requests.exceptions.Timeout:
-        result["message"] = "Request timed out after 120 seconds"
-        logger.log(f"\n[FAILED] {result['message']}", Colors.RED)
-        return result
     except Exception as e:
-        result["message"] = f"Error: {str(e)}"
-        logger.log(f"\n[FAILED] {result['message']}", Colors.RED)
+        # isinstance (not type lookup) so subclasses such as ReadTimeout match
+        result["message"] = next(
+            (msg for exc_type, msg in _ERROR_MESSAGES if isinstance(e, exc_type)),
+            f"Error: {e}",
+        )
+        log.log(f"\n[FAILED] {result['message']}", Colors.RED)
         return result
 
 
@@ -190,11 +267,21 @@ def run_test(
 def main():
     """Run all tests and calculate final score"""
 
-    logger.log("=" * 70, Colors.BOLD + Colors.BLUE)
+    logger.log(SEP, Colors.BOLD + Colors.BLUE)
     logger.log("Travel Assistant API (D3) - Test Suite", Colors.BOLD + Colors.BLUE)
-    logger.log("=" * 70, Colors.BOLD + Colors.BLUE)
+    logger.log(SEP, Colors.BOLD + Colors.BLUE)
     logger.log("\nThis test validates the /travel-assistant endpoint.\n")
 
+    # Probe once up front (this also opens the pooled connection) so a down
+    # server stops the run instead of failing every test
+    try:
+        SESSION.get(f"{BASE_URL}/health", timeout=CONNECT_TIMEOUT)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        logger.log(
+            f"[FAILED] Server not reachable at {BASE_URL}", Colors.RED + Colors.BOLD
+        )
+        sys.exit(2)
+
     test_cases = [
         {
             "name": "Test 1: Flight Query",
@@ -229,10 +316,29 @@ def main():
         },
     ]
 
-    results = []
+    # The payloads are fixed, so serialize each one once up front
     for tc in test_cases:
-        result = run_test(tc["name"], tc["payload"], tc["expect_success"])
-        results.append(result)
+        tc["body"] = orjson.dumps(tc["payload"])
+
+    # Tests are independent, so run them concurrently. Each one logs into its
+    # own buffer, which is written out in test order once that test finishes
+    buffers = [BufferedLog() for _ in test_cases]
+    results = []
+    with ThreadPoolExecutor(max_workers=len(test_cases)) as executor:
+        futures = [
+            executor.submit(
+                run_test,
+                tc["name"],
+                tc["payload"],
+                tc["expect_success"],
+                buffer,
+                body=tc["body"],
+            )
+            for tc, buffer in zip(test_cases, buffers)
+        ]
+        for future, buffer in zip(futures, buffers):
+            results.append(future.result())
+            buffer.replay(logger)
 
     # ==========================================================================
     # CALCULATE FINAL RESULTS
@@ -240,9 +346,9 @@ def main():
     tests_passed = sum(1 for r in results if r["passed"])
     total_tests = len(test_cases)
 
-    logger.log(f"\n{'=' * 70}", Colors.BOLD)
+    logger.log(SEP_LINE, Colors.BOLD)
     logger.log("FINAL RESULTS", Colors.BOLD + Colors.BLUE)
-    logger.log(f"{'=' * 70}", Colors.BOLD)
+    logger.log(SEP, Colors.BOLD)
     logger.log(f"Tests Passed: {tests_passed}/{total_tests}", Colors.BOLD)
 
     logger.log(f"\n--- Test Breakdown ---")
@@ -250,7 +356,7 @@ def main():
         status = "✓" if res["passed"] else "✗"
         logger.log(f"  {status} Test {i}: {res['message']}")
 
-    logger.log(f"\n{'=' * 70}")
+    logger.log(SEP_LINE)
 
     if tests_passed == total_tests:
         logger.log("ALL TESTS PASSED!", Colors.GREEN + Colors.BOLD)
@@ -0,0 +1,110 @@
+"""The LLM cache must serve a repeated query without calling the model."""
+
+import os
+from uuid import uuid4
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import main
+
+
+class CountingChatModel(GenericFakeChatModel):
+    """Fake chat model that counts real (uncached) generations."""
+
+    calls: int = 0
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+
+def make_model():
+    replies = [
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "get_weather", "args": {"location": "Tokyo"}, "id": "call_1"}
+            ],
+            usage_metadata={"input_tokens": 12, "output_tokens": 5, "total_tokens": 17},
+        ),
+        AIMessage(
+            content="Day 1: Senso-ji",
+            usage_metadata={"input_tokens": 40, "output_tokens": 6, "total_tokens": 46},
+        ),
+    ]
+    return CountingChatModel(messages=iter(replies), cache=main.ContentKeyedCache())
+
+
+async def run_agent(model, query):
+    """Drive the same two LLM steps as the graph, with fresh message ids."""
+    messages = [HumanMessage(content=query, id=str(uuid4()))]
+    reply = await model.ainvoke([main._SYSTEM_MESSAGE, *messages])
+    messages.append(reply.model_copy(update={"id": str(uuid4())}))
+    for call in reply.tool_calls:
+        messages.append(
+            ToolMessage(
+                content='{"temp":"22C"}',
+                tool_call_id=call["id"],
+                name=call["name"],
+                id=str(uuid4()),
+            )
+        )
+    return await model.ainvoke([main._SYSTEM_MESSAGE, *messages])
+
+
+async def test_repeated_query_makes_no_llm_calls():
+    model = make_model()
+
+    first = await run_agent(model, "Plan 3 days in Tokyo")
+    assert model.calls == 2
+
+    second = await run_agent(model, "Plan 3 days in Tokyo")
+    assert model.calls == 2
+    assert second.content == first.content
+
+
+async def test_different_query_misses():
+    model = make_model()
+
+    await model.ainvoke([main._SYSTEM_MESSAGE, HumanMessage(content="Plan Tokyo")])
+    await model.ainvoke([main._SYSTEM_MESSAGE, HumanMessage(content="Plan Kyoto")])
+    assert model.calls == 2
+
+
+async def test_repeated_graph_run_replays_from_caches(monkeypatch):
+    model = make_model()
+    monkeypatch.setattr(main, "get_llm_with_tools", lambda: model)
+
+    first = await main.run_query("Plan 3 days in Tokyo")
+    assert model.calls == 2
+
+    second = await main.run_query("Plan 3 days in Tokyo")
+    assert model.calls == 2
+    assert second == first == "Day 1: Senso-ji"
+
+
+async def test_cached_stream_sends_plan(monkeypatch):
+    model = make_model()
+    monkeypatch.setattr(main, "get_llm_with_tools", lambda: model)
+    await main.run_query("Plan 3 days in Tokyo")
+
+    frames = [frame async for frame in main.stream_llm_response("Plan 3 days in Tokyo")]
+    assert model.calls == 2
+    assert b"Day 1: Senso-ji" in b"".join(frames)
+
+
+def test_endpoint_whitespace_variant_hits_cache(monkeypatch):
+    model = make_model()
+    monkeypatch.setattr(main, "get_llm_with_tools", lambda: model)
+    client = TestClient(main.api_app)
+
+    first = client.post("/travel-assistant", json={"query": "Plan 3 days in Tokyo"})
+    second = client.post(
+        "/travel-assistant", json={"query": " Plan  3 days\tin Tokyo "}
+    )
+    assert model.calls == 2
+    assert second.json()["response"] == first.json()["response"]